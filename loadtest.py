@@ -0,0 +1,340 @@
+"""
+Load testing harness for the dashboard
+
+Starts one `streamlit run` server for main.py, with every upstream API replaced by a local stand-in server of
+configurable latency and payload size, and drives batches of concurrent viewer sessions at it over Streamlit's
+websocket, as browsers do. Reports the cold first load, made while every cache is empty, apart from the first loads and
+reruns of each batch, along with the server's RSS and its growth per open session, so that the number of concurrent
+viewers one container can serve can be read off for a latency target and a memory limit. RSS is read from /proc, so
+the harness runs on Linux.
+
+Usage: python loadtest.py --sessions 1 4 8 16 --runs 5 --latency-ms 200 --rows 1000 --target-ms 1000
+                          --memory-limit-mb 1024
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+from tornado.websocket import websocket_connect
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+CHAINS = ['Ethereum', 'Polygon', 'Arbitrum', 'Optimism', 'Gnosis', 'BSC', 'Avalanche', 'Base']
+WALLETS = ['PSM', 'DSR', 'Uniswap', 'Curve', 'Aave', 'Compound', 'CEX', 'Other']
+COLLATERALS = ['ETH-A', 'ETH-B', 'ETH-C', 'WBTC-A', 'WSTETH-A', 'RWA', 'PSM-USDC-A', 'PSM-GUSD-A']
+
+
+def _days(rows):
+    """
+    :param rows: number of days of history
+    :return: list of datetimes ending today
+    """
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return [today - timedelta(days=rows - 1 - i) for i in range(rows)]
+
+
+def build_payload(path, rows):
+    """
+    Builds a synthetic response body shaped like the upstream API serving the given path
+    :param path: request path on the stand-in server
+    :param rows: number of days of history per series
+    :return: JSON-serializable payload
+    """
+    days = _days(rows)
+    if path.startswith('/glassnode/'):
+        return [{'t': int(day.timestamp()), 'v': random.uniform(1e8, 1e11)} for day in days]
+    elif path.startswith('/defillama/'):
+        return {'chainBalances': {chain: {'tokens': [
+            {'date': int(day.timestamp()), 'circulating': {'peggedUSD': random.uniform(1e6, 1e9)}} for day in days]}
+            for chain in CHAINS}}
+    elif path.startswith('/blockanalitica/risk/'):
+        return {'results': [{'drop': drop, 'protection_score': score, 'ilk': ilk, 'debt': random.uniform(0, 1e8)}
+                            for drop in range(1, 101) for score in ['low', 'medium', 'high'] for ilk in COLLATERALS]}
+    elif path.startswith('/blockanalitica/psms/'):
+        return [{'datetime': day.isoformat(), 'USDC': random.uniform(1e8, 1e9), 'GUSD': random.uniform(1e8, 1e9)}
+                for day in days[-90:]]
+    elif path.startswith('/makerburn/history'):
+        return [{'date': day.isoformat(), 'surplus': random.uniform(5e7, 1e8)} for day in days]
+    elif path.startswith('/makerburn/treasury'):
+        return {'history': [{'date': day.isoformat(), 'dai_balance': random.uniform(1e6, 1e7),
+                             'system_surplus': random.uniform(5e7, 1e8), 'mkr_price': random.uniform(500, 2000),
+                             'mkr_balance': random.uniform(1e4, 1e5), 'aave_price': random.uniform(50, 100),
+                             'aave_balance': random.uniform(1e3, 1e4), 'ens_price': random.uniform(5, 20),
+                             'ens_balance': random.uniform(1e3, 1e4)} for day in days]}
+    elif path.startswith('/dune/query/3059618'):
+        return {'result': {'rows': [{'dt': f'{day:%Y-%m-%d} 00:00:00.000 UTC', 'wallet': wallet,
+                                     'balance': random.uniform(1e6, 1e9)} for day in days for wallet in WALLETS]}}
+    elif path.startswith('/dune/query/3059627'):
+        return {'result': {'rows': [{'dt': f'{day:%Y-%m-%d} 00:00:00.000 UTC', 'collateral': collateral,
+                                     'annual_revenues': random.uniform(1e5, 1e8), 'asset': random.uniform(1e6, 1e9)}
+                                    for day in days for collateral in COLLATERALS]}}
+    elif path.startswith('/dune/query/3059668'):
+        return {'result': {'rows': [{'date': f'{day:%Y-%m-%d}', 'psm_balance': random.uniform(1e8, 1e9),
+                                     'inflow': random.uniform(0, 1e7), 'outflow': -random.uniform(0, 1e7),
+                                     'lifetime_fees': random.uniform(1e6, 1e7), 'fees': random.uniform(0, 1e4)}
+                                    for day in days]}}
+    else:
+        raise KeyError(path)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Local stand-in for every upstream API, serving synthetic payloads after a configurable delay
+    """
+    daemon_threads = True
+
+    def __init__(self, address, latency, jitter, rows):
+        """
+        :param address: (host, port) to listen on, port 0 picks a free port
+        :param latency: response delay in seconds
+        :param jitter: maximum extra random delay in seconds
+        :param rows: number of days of history per series
+        """
+        super().__init__(address, StandInHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rows = rows
+        self.request_counts = Counter()
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def payload(self, path):
+        """
+        Encoded payload for a path, built once and reused for every request
+        :param path: request path
+        :return: bytes
+        """
+        with self._lock:
+            self.request_counts[path] += 1
+            if path not in self._payloads:
+                self._payloads[path] = json.dumps(build_payload(path, self.rows)).encode()
+            return self._payloads[path]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa
+        path = urlparse(self.path).path
+        try:
+            body = self.server.payload(path)
+        except KeyError:
+            self.send_error(404)
+            return
+        time.sleep(self.server.latency + random.uniform(0, self.server.jitter))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # noqa
+        pass
+
+
+def free_port():
+    """
+    :return: a TCP port that is free on the loopback interface
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(app_path, secrets, port, workdir):
+    """
+    Starts the app with `streamlit run` in a subprocess, from a working directory holding its secrets
+    :param app_path: path to the Streamlit script
+    :param secrets: secrets written to .streamlit/secrets.toml
+    :param port: port the app listens on
+    :param workdir: working directory of the server, where its log is written too
+    :return: subprocess.Popen of the server
+    """
+    os.makedirs(os.path.join(workdir, '.streamlit'), exist_ok=True)
+    with open(os.path.join(workdir, '.streamlit', 'secrets.toml'), 'w') as f:
+        f.writelines(f'{key} = {json.dumps(value)}\n' for key, value in secrets.items())
+
+    with open(os.path.join(workdir, 'server.log'), 'w') as log:
+        return subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', os.path.abspath(app_path),
+                                 '--server.headless', 'true', '--server.port', str(port),
+                                 '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false'],
+                                cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_healthy(app, port, timeout):
+    """
+    Waits for the app's health endpoint to answer
+    :param app: subprocess.Popen of the server
+    :param port: port the app listens on
+    :param timeout: seconds to wait
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if app.poll() is not None:
+            raise RuntimeError(f'Streamlit server exited with code {app.returncode}')
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError('Streamlit server did not become healthy')
+
+
+def rss_mb(pid):
+    """
+    :param pid: process id
+    :return: tuple of current and peak resident set size of the process in MB
+    """
+    with open(f'/proc/{pid}/status') as f:
+        status = dict(line.split(':', 1) for line in f)
+    return int(status['VmRSS'].split()[0]) / 1024, int(status['VmHWM'].split()[0]) / 1024
+
+
+async def run_script(ws, timeout):
+    """
+    Asks the server for a full script run, as a browser does on page load or widget interaction, and waits for the
+    run to finish
+    :param ws: websocket connection of the session
+    :param timeout: seconds before the run is abandoned
+    :return: seconds from request to the script finished message
+    """
+    msg = BackMsg()
+    msg.rerun_script.query_string = ''
+    msg.rerun_script.page_script_hash = ''
+    start = time.perf_counter()
+    await ws.write_message(msg.SerializeToString(), binary=True)
+    while True:
+        data = await asyncio.wait_for(ws.read_message(), timeout - (time.perf_counter() - start))
+        if data is None:
+            raise RuntimeError('Streamlit server closed the session')
+        forward_msg = ForwardMsg.FromString(data)
+        element = forward_msg.delta.new_element
+        if forward_msg.WhichOneof('type') == 'delta' and element.WhichOneof('type') == 'exception':
+            raise RuntimeError(f'App raised during load test: {element.exception.message}')
+        if forward_msg.WhichOneof('type') == 'script_finished':
+            return time.perf_counter() - start
+
+
+async def connect(port):
+    """
+    :param port: port the app listens on
+    :return: websocket connection of a new session
+    """
+    return await websocket_connect(f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'])
+
+
+async def run_batch(port, pid, sessions, runs, timeout):
+    """
+    Opens concurrent sessions, loads the page in all of them at once, then reruns them together several times and
+    reads the server's RSS while they are all open
+    :param port: port the app listens on
+    :param pid: process id of the server
+    :param sessions: number of concurrent sessions
+    :param runs: script runs per session, the first one being its first load
+    :param timeout: per run timeout in seconds
+    :return: tuple of first load times, rerun times and current RSS in MB
+    """
+    sockets = await asyncio.gather(*(connect(port) for _ in range(sessions)))
+    try:
+        first_loads = await asyncio.gather(*(run_script(ws, timeout) for ws in sockets))
+        reruns = []
+        for _ in range(runs - 1):
+            reruns += await asyncio.gather(*(run_script(ws, timeout) for ws in sockets))
+        return first_loads, reruns, rss_mb(pid)[0]
+    finally:
+        for ws in sockets:
+            ws.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test one dashboard server with concurrent sessions')
+    parser.add_argument('--app', default='main.py', help='Streamlit script to load test')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 8], help='concurrent sessions per batch')
+    parser.add_argument('--runs', type=int, default=3, help='script runs per session, including its first load')
+    parser.add_argument('--latency-ms', type=float, default=200, help='upstream response delay')
+    parser.add_argument('--jitter-ms', type=float, default=50, help='maximum extra random upstream delay')
+    parser.add_argument('--rows', type=int, default=1000, help='days of history per upstream series')
+    parser.add_argument('--timeout', type=float, default=120, help='per run timeout in seconds')
+    parser.add_argument('--target-ms', type=float, help='p95 first load and rerun time viewers should get')
+    parser.add_argument('--memory-limit-mb', type=float, help='memory limit of the container')
+    args = parser.parse_args()
+
+    server = StandInServer(('127.0.0.1', 0), args.latency_ms / 1000, args.jitter_ms / 1000, args.rows)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    secrets = {
+        'GLASSNODE_API_KEY': 'load-test',
+        'DUNE_API_KEY': 'load-test',
+        'GLASSNODE_API_URL': f'{server.base_url}/glassnode',
+        'DEFILLAMA_API_URL': f'{server.base_url}/defillama',
+        'BLOCK_ANALYTICA_API_URL': f'{server.base_url}/blockanalitica',
+        'MKRBURN_API_URL': f'{server.base_url}/makerburn',
+        'DUNE_API_URL': f'{server.base_url}/dune',
+    }
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        app = start_app(args.app, secrets, port, workdir)
+        try:
+            wait_until_healthy(app, port, args.timeout)
+            idle_rss = rss_mb(app.pid)[0]
+            cold_load, _, cold_rss = asyncio.run(run_batch(port, app.pid, 1, 1, args.timeout))
+            print(f'Upstream latency: {args.latency_ms:.0f}ms (+{args.jitter_ms:.0f}ms jitter), rows per series: '
+                  f'{args.rows}, runs per session: {args.runs}')
+            print(f'Server RSS: {idle_rss:.0f}MB idle, {cold_rss:.0f}MB after the cold first load of '
+                  f'{cold_load[0]:.2f}s, with every cache empty')
+
+            batches = []
+            for sessions in args.sessions:
+                before_rss = rss_mb(app.pid)[0]
+                first_loads, reruns, open_rss = asyncio.run(run_batch(port, app.pid, sessions, args.runs,
+                                                                      args.timeout))
+                first_p50, first_p95 = np.percentile(first_loads, [50, 95])
+                rerun_p50, rerun_p95 = np.percentile(reruns, [50, 95]) if reruns else (np.nan, np.nan)
+                per_session = max(open_rss - before_rss, 0) / sessions
+                batches.append((sessions, max(first_p95, rerun_p95 if reruns else 0), per_session))
+                print(f'{sessions} sessions: first load p50 {first_p50:.3f}s, p95 {first_p95:.3f}s; '
+                      f'rerun p50 {rerun_p50:.3f}s, p95 {rerun_p95:.3f}s; '
+                      f'server RSS {open_rss:.0f}MB, +{per_session:.1f}MB per open session')
+            print(f'Server peak RSS: {rss_mb(app.pid)[1]:.0f}MB')
+        except Exception:
+            print(f'Streamlit server log:\n{open(os.path.join(workdir, "server.log")).read()}', file=sys.stderr)
+            raise
+        finally:
+            app.terminate()
+            app.wait()
+            server.shutdown()
+
+    print(f'Upstream requests: {sum(server.request_counts.values())} total')
+    for path, count in sorted(server.request_counts.items()):
+        print(f'  {path}: {count}')
+
+    if args.target_ms:
+        within_target = [sessions for sessions, p95, _ in batches if p95 * 1000 <= args.target_ms]
+        print(f'Most concurrent sessions within the {args.target_ms:.0f}ms p95 target: '
+              f'{max(within_target) if within_target else "none of the batches"}')
+    if args.memory_limit_mb:
+        per_session = max(per_session for _, _, per_session in batches)
+        fitting = (args.memory_limit_mb - cold_rss) / per_session if per_session else float('inf')
+        print(f'Open sessions fitting in {args.memory_limit_mb:.0f}MB at +{per_session:.1f}MB each: {fitting:.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,30 @@
-import httpx
+import asyncio
+import json
 import logging
 
+import httpx
+
 logging.basicConfig(level=logging.DEBUG)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
+def _decode_and_process(processor, content, metric_name):
+    """
+    Decodes a raw response body and runs it through the processor
+    :param processor: Processor instance
+    :param content: response body bytes
+    :param metric_name: name of metric
+    :return: processed data
+    """
+    return processor.process(data=json.loads(content), metric_name=metric_name)
+
+
 class Metric:
     def __init__(self, base_url, endpoint, api_key, processor,
                  metric_name=None, params=None, headers=None,
                  asset_name=None, df_col_name=None):
         self.api_key = api_key
+        self.base_url = base_url
         self.df_col_name = df_col_name
         self.metric_name = f"{asset_name}_{metric_name}" if asset_name else metric_name
         self.url = f"{base_url}/{endpoint}/{metric_name}" if metric_name else f"{base_url}/{endpoint}"
@@ -17,9 +32,11 @@ class Metric:
         self.processor = processor
         self.headers = headers
 
-    async def fetch_data(self):
+    async def fetch_data(self, executor=None):
         """
         Fetches data from the API
+        :param executor: optional concurrent.futures Executor used to decode and process the response off the event
+        loop; processed inline when None
         :return: dict with the metric name as key and the processed data as value
         """
         logging.info(f'Fetching data for {self.metric_name} from {self.url}')
@@ -32,8 +49,12 @@ class Metric:
                 response = await client.get(self.url, params=self.params)
 
         if response.status_code == 200:
-            raw_data = response.json()
-            processed_data = self.processor.process(data=raw_data, metric_name=self.df_col_name)
+            if executor is None:
+                processed_data = _decode_and_process(self.processor, response.content, self.df_col_name)
+            else:
+                loop = asyncio.get_running_loop()
+                processed_data = await loop.run_in_executor(executor, _decode_and_process, self.processor,
+                                                            response.content, self.df_col_name)
             return {self.df_col_name: processed_data}
         else:
             raise ValueError(f'Error fetching data from API: {response.status_code}')
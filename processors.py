@@ -1,12 +1,78 @@
 from abc import ABC, abstractmethod
-from datetime import datetime
 
 import pandas as pd
 from pandas import json_normalize
+import pyarrow as pa
+import pyarrow.compute as pc
 
 import streamlit as st
 
 
+# Raised when Arrow cannot infer a column's type, e.g. mixed strings and numbers or integers beyond int64, which
+# pandas keeps as object columns
+_INFERENCE_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError)
+
+# Beyond this many keys per row, gathering each column from the rows costs more than pandas' row-wise construction
+_WIDE_ROW_KEYS = 8
+
+
+def _rows_to_table(rows):
+    """
+    Builds a pyarrow Table from a list of JSON objects, one column per key
+    :param rows: list of dicts
+    :return: pyarrow Table
+    """
+    keys = dict.fromkeys(key for row in rows for key in row)
+    return pa.table({key: pa.array([row.get(key) for row in rows]) for key in keys})
+
+
+def _parse_dates(column):
+    """
+    Parses the YYYY-MM-DD prefix of date strings with vectorized Arrow kernels
+    :param column: pyarrow string array
+    :return: pyarrow timestamp array
+    """
+    return pc.strptime(pc.utf8_slice_codeunits(column, 0, 10), format='%Y-%m-%d', unit='s')
+
+
+def _to_frame(table, index_column, index, index_name=None):
+    """
+    Converts a pyarrow Table to a pandas DataFrame indexed by timestamps, one block per column so that no
+    consolidation copy is made
+    :param table: pyarrow Table
+    :param index_column: name of the column replaced by the index
+    :param index: pyarrow timestamp array
+    :param index_name: name of the resulting index
+    :return: pandas dataframe
+    """
+    index = pd.DatetimeIndex(pc.cast(index, pa.timestamp('ns')).to_pandas(), name=index_name)
+    df = table.drop([index_column]).to_pandas(split_blocks=True)
+    df.index = index
+    return df
+
+
+def _dated_frame(rows, date_column, index_name=None):
+    """
+    Builds a DataFrame indexed by the YYYY-MM-DD prefix of a date column, through Arrow for narrow rows whose column
+    types can be inferred and through pandas otherwise
+    :param rows: list of dicts
+    :param date_column: name of the column holding the dates
+    :param index_name: name of the resulting index
+    :return: pandas dataframe
+    """
+    if not rows or len(rows[0]) <= _WIDE_ROW_KEYS:
+        try:
+            table = _rows_to_table(rows)
+        except _INFERENCE_ERRORS:
+            pass
+        else:
+            return _to_frame(table, date_column, _parse_dates(table[date_column]), index_name=index_name)
+
+    df = pd.DataFrame(rows).set_index(date_column)
+    df.index = pd.to_datetime([x[:10] for x in df.index], format='%Y-%m-%d').rename(index_name)
+    return df
+
+
 class Processor(ABC):
     @abstractmethod
     def process(self, data):
@@ -25,13 +91,17 @@ class GlassNodeProcessor(Processor):
         :param metric_name: name of metric
         :return: pandas dataframe
         """
-        df = json_normalize(data)
-        df.set_index('t', inplace=True)
+        try:
+            table = _rows_to_table(data).flatten()
+        except _INFERENCE_ERRORS:
+            df = json_normalize(data).set_index('t')
+            df.index = pd.to_datetime(df.index, unit='s')
+        else:
+            df = _to_frame(table, 't', pc.cast(table['t'], pa.timestamp('s')), index_name='t')
         if len(df.columns) > 1:
             df.columns = [x.split('.')[1] for x in df.columns]
         else:
             df.columns = [metric_name]
-        df.index = pd.to_datetime(df.index, unit='s')
         return df
 
 
@@ -50,12 +120,13 @@ class DeFiLlamaProcessor(Processor):
         merged_df = pd.DataFrame()
         chains = list(data['chainBalances'].keys())
         for chain in chains:
-            data_list = []
-            for entry in data['chainBalances'][chain]['tokens']:
-                date = datetime.fromtimestamp(entry['date'])
-                circulating_supply = entry['circulating']['peggedUSD']
-                data_list.append({'date': date, f'{chain}_circulating_supply': circulating_supply})
-            chain_df = pd.DataFrame(data_list).set_index('date')
+            tokens = data['chainBalances'][chain]['tokens']
+            table = pa.table({
+                'date': pa.array([entry['date'] for entry in tokens], type=pa.int64()),
+                f'{chain}_circulating_supply': pa.array([entry['circulating']['peggedUSD'] for entry in tokens],
+                                                        type=pa.float64()),
+            })
+            chain_df = _to_frame(table, 'date', pc.cast(table['date'], pa.timestamp('s')), index_name='date')
             if merged_df.empty:
                 merged_df = chain_df
             else:
@@ -71,13 +142,12 @@ class BlockAnalyticaProcessor(Processor):
 
     def process(self, data, metric_name):  # noqa
         if metric_name == 'Debt-at-Risk':
-            df = pd.DataFrame(data['results'])
-            return df
+            try:
+                return _rows_to_table(data['results']).to_pandas(split_blocks=True, self_destruct=True)
+            except _INFERENCE_ERRORS:
+                return pd.DataFrame(data['results'])
         elif metric_name == 'PSMS':
-            df = pd.DataFrame(data)
-            df.set_index('datetime', inplace=True)
-            df.index = pd.to_datetime([x[:10] for x in df.index], format='%Y-%m-%d')
-            return df
+            return _dated_frame(data, 'datetime')
         else:
             return data
 
@@ -95,14 +165,9 @@ class MKRBurnProcessor(Processor):
         :return: pandas dataframe
         """
         if metric_name == 'Surplus Buffer':
-            df = pd.DataFrame(data)
-            df.set_index('date', inplace=True)
-            df.index = pd.to_datetime([x[:10] for x in df.index], format='%Y-%m-%d')
-            return df
+            return _dated_frame(data, 'date')
         elif metric_name == 'Treasury':
-            df = pd.DataFrame(data['history'])
-            df.set_index('date', inplace=True)
-            df.index = pd.to_datetime([x[:10] for x in df.index], format='%Y-%m-%d')
+            df = _dated_frame(data['history'], 'date')
             df['MKR Balance'] = df['mkr_price'] * df['mkr_balance']
             df['AAVE Balance'] = df['aave_price'] + df['aave_balance']
             df['ENS Balance'] = df['ens_price'] * df['ens_balance']
@@ -122,11 +187,8 @@ class DuneProcessor(Processor):
         :param metric_name: name of metric
         :return: pandas dataframe
         """
-        df = pd.DataFrame(data['result']['rows'])
-        if 'date' in list(df.columns):
-            df.set_index('date', inplace=True)
-            df.index = pd.to_datetime(df.index, format='%Y-%m-%d')
+        rows = data['result']['rows']
+        if any('date' in row for row in rows):
+            return _dated_frame(rows, 'date', index_name='date')
         else:
-            df.set_index('dt', inplace=True)
-            df.index = pd.to_datetime([x[:10] for x in df.index], format='%Y-%m-%d')
-        return df
+            return _dated_frame(rows, 'dt')
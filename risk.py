@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+
+class DebtAtRiskEngine:
+    """
+    Vectorized what-if engine over the Block Analytica liquidation curve
+    """
+
+    def __init__(self, df, collateral_col=None):
+        """
+        Precomputes cumulative debt per collateral and protection score over the price drop grid
+        :param df: liquidation curve with 'drop' (fraction), 'protection_score' and 'debt' columns
+        :param collateral_col: optional column identifying the collateral of each row, enables per-collateral shocks
+        """
+        self.drops, drop_idx = np.unique(df['drop'].to_numpy(dtype=float), return_inverse=True)
+        self.protection_scores, score_idx = np.unique(df['protection_score'].astype(str).to_numpy(),
+                                                      return_inverse=True)
+        if collateral_col:
+            self.collaterals, collateral_idx = np.unique(df[collateral_col].astype(str).to_numpy(),
+                                                         return_inverse=True)
+        else:
+            self.collaterals, collateral_idx = np.array(['All']), np.zeros(len(df), dtype=int)
+
+        # Slot 0 holds zero debt so that drops below the first grid point resolve to nothing liquidated
+        debt = np.zeros((len(self.collaterals), len(self.protection_scores), len(self.drops) + 1))
+        np.add.at(debt, (collateral_idx, score_idx, drop_idx + 1), df['debt'].to_numpy(dtype=float))
+        self._cumulative = debt.cumsum(axis=2)
+
+    @staticmethod
+    def _vector(values, labels):
+        """
+        Converts an optional {label: value} mapping into an array aligned with labels, defaulting to 1
+        :param values: dict or None
+        :param labels: array of labels
+        :return: numpy array
+        """
+        values = values or {}
+        return np.array([values.get(label, 1.0) for label in labels], dtype=float)
+
+    def cumulative(self, drops, shocks=None, weights=None):
+        """
+        Debt liquidated up to each price drop, per protection score
+        :param drops: array of price drops (fractions)
+        :param shocks: optional dict of collateral -> multiplier applied to the price drop of that collateral
+        :param weights: optional dict of protection score -> weight applied to its debt
+        :return: numpy array of shape (len(drops), len(protection_scores))
+        """
+        effective_drops = np.multiply.outer(np.asarray(drops, dtype=float), self._vector(shocks, self.collaterals))
+        idx = np.searchsorted(self.drops, effective_drops, side='right')
+        collaterals = np.arange(len(self.collaterals))[None, :, None]
+        scores = np.arange(len(self.protection_scores))[None, None, :]
+        debt = self._cumulative[collaterals, scores, idx[:, :, None]].sum(axis=1)
+        return debt * self._vector(weights, self.protection_scores)
+
+    def at(self, drop, shocks=None, weights=None):
+        """
+        Debt-at-Risk for a single price drop scenario
+        :param drop: price drop (fraction)
+        :param shocks: optional dict of collateral -> multiplier applied to the price drop of that collateral
+        :param weights: optional dict of protection score -> weight applied to its debt
+        :return: pandas Series indexed by protection score
+        """
+        return pd.Series(self.cumulative([drop], shocks, weights)[0], index=self.protection_scores)
+
+    def curve(self, shocks=None, weights=None):
+        """
+        Debt liquidated at each price drop of the grid, the shape of the Block Analytica liquidation curve
+        :param shocks: optional dict of collateral -> multiplier applied to the price drop of that collateral
+        :param weights: optional dict of protection score -> weight applied to its debt
+        :return: pandas DataFrame indexed by drop with one column per protection score
+        """
+        debt = np.diff(self.cumulative(self.drops, shocks, weights), axis=0, prepend=0)
+        return pd.DataFrame(debt, index=pd.Index(self.drops, name='drop'), columns=self.protection_scores)
@@ -0,0 +1,177 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+
+from utils import freeze
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Raised instead of calling a host whose circuit breaker is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing host after repeated failures, letting a single trial request through once a cool-down
+    has passed
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=60):
+        """
+        :param failure_threshold: consecutive failures that open the circuit
+        :param reset_timeout: seconds to wait before letting a trial request through an open circuit
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """
+        :return: whether a request to the host may be made now
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial_in_flight and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class StaleWhileRevalidate:
+    """
+    Serving policy around Metric.fetch_data: serves the last good processed data of each metric immediately and
+    refreshes stale entries in the background, behind one circuit breaker per base url
+    """
+
+    def __init__(self, max_ages, default_max_age=600, executor=None, request_timeout=30, first_load_timeout=10,
+                 failure_threshold=3, reset_timeout=60):
+        """
+        :param max_ages: dict with base urls as keys and seconds after which their data is refreshed as values
+        :param default_max_age: max age for sources missing from max_ages
+        :param executor: optional Executor used to decode and process responses off the event loop
+        :param request_timeout: seconds before a fetch is abandoned and counted as a failure
+        :param first_load_timeout: seconds a viewer waits for metrics that have never been fetched
+        :param failure_threshold: consecutive failures that open a host's circuit
+        :param reset_timeout: seconds before an open circuit lets a trial request through
+        """
+        self.max_ages = max_ages
+        self.default_max_age = default_max_age
+        self.executor = executor
+        self.request_timeout = request_timeout
+        self.first_load_timeout = first_load_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self._entries = {}
+        self._max_age_of = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        # Background refreshes run on their own event loop so that viewers never wait on them
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name='stale-while-revalidate', daemon=True).start()
+
+    def _breaker(self, base_url):
+        with self._lock:
+            if base_url not in self.breakers:
+                self.breakers[base_url] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[base_url]
+
+    async def fetch(self, metric, executor=None):
+        """
+        Fetches a metric through its host's circuit breaker and stores the result as the last good data
+        :param metric: Metric object
+        :param executor: optional Executor overriding the policy's one
+        :return: dict with the metric name as key and the processed data as value
+        """
+        breaker = self._breaker(metric.base_url)
+        if not breaker.allow_request():
+            raise CircuitOpenError(f'Circuit open for {metric.base_url}, skipping {metric.metric_name}')
+        try:
+            result = await asyncio.wait_for(metric.fetch_data(executor=executor or self.executor),
+                                            self.request_timeout)
+        except Exception as e:
+            breaker.record_failure()
+            logging.warning(f'Error fetching data for {metric.metric_name} from {metric.url}: {e!r}')
+            raise
+        breaker.record_success()
+
+        fetched_at = time.time()
+        with self._lock:
+            for key, value in result.items():
+                self._entries[key] = (value, fetched_at)
+        return result
+
+    def _schedule(self, metric):
+        """
+        Starts a background refresh of a metric unless one is already in flight
+        :param metric: Metric object
+        :return: concurrent.futures Future of the refresh
+        """
+        with self._lock:
+            future = self._inflight.get(metric.df_col_name)
+            if future is None or future.done():
+                future = asyncio.run_coroutine_threadsafe(self.fetch(metric), self._loop)
+                self._inflight[metric.df_col_name] = future
+            return future
+
+    def get(self, metrics):
+        """
+        Returns the last good data of the given metrics, refreshing stale entries in the background. Metrics that
+        have never been fetched are waited on for at most first_load_timeout seconds and are left out if they are
+        not available by then
+        :param metrics: list of Metric objects
+        :return: read-only mapping with metric names as keys and DataFrames as values, versioned by fetch time
+        """
+        now = time.time()
+        first_loads = []
+        for metric in metrics:
+            self._max_age_of[metric.df_col_name] = self.max_ages.get(metric.base_url, self.default_max_age)
+            entry = self._entries.get(metric.df_col_name)
+            if entry is None or now - entry[1] > self._max_age_of[metric.df_col_name]:
+                future = self._schedule(metric)
+                if entry is None:
+                    first_loads.append(future)
+        concurrent.futures.wait(first_loads, timeout=self.first_load_timeout)
+
+        names = {metric.df_col_name for metric in metrics}
+        with self._lock:
+            entries = {name: entry for name, entry in self._entries.items() if name in names}
+        return freeze({name: value for name, (value, _) in entries.items()},
+                      versions={name: fetched_at for name, (_, fetched_at) in entries.items()})
+
+    def age(self, name):
+        """
+        :param name: metric name
+        :return: seconds since the metric's data was last fetched, None if it never was
+        """
+        entry = self._entries.get(name)
+        return None if entry is None else time.time() - entry[1]
+
+    def is_stale(self, name):
+        """
+        :param name: metric name
+        :return: whether the metric's data served to viewers is older than its max age
+        """
+        age = self.age(name)
+        return age is not None and age > self._max_age_of.get(name, self.default_max_age)
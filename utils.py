@@ -1,16 +1,66 @@
-import asyncio
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 
+import pandas as pd
 
-async def prepare_data(metrics):  # noqa
+# FrozenData hands out shallow copies of shared frames, which only keeps them unchanged under copy-on-write
+pd.set_option('mode.copy_on_write', True)
+
+
+def create_executor(kind='thread', max_workers=None):
+    """
+    Creates a worker pool for work such as processing API responses and building charts. Process pools are not
+    offered: workers forked from the Streamlit server copy locks held by its other threads, and spawned workers
+    re-execute the app script, which Streamlit runs as __main__
+    :param kind: 'thread'
+    :param max_workers: maximum number of tasks run in parallel
+    :return: concurrent.futures Executor
+    """
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers)
+    else:
+        raise ValueError(f'Unknown executor kind: {kind}')
+
+
+class FrozenData(Mapping):
     """
-    Fetches data from the API for the given metrics
-    :param metrics: list of Metric objects
-    :return: pandas DataFrame
+    Read-only mapping of datasets shared by every chart, rerun and session. Each lookup hands out a shallow copy of
+    the stored DataFrame with its own axes, so that with pandas copy-on-write enabled, setting values, adding or
+    dropping columns and renaming axes on it copy the affected data instead of changing the shared frame
+    """
+
+    def __init__(self, data_dict, versions=None):
+        """
+        :param data_dict: dict with metric names as keys and DataFrames as values
+        :param versions: optional dict with metric names as keys and identifiers of their data, such as fetch times,
+        as values
+        """
+        self._data = dict(data_dict)
+        self.versions = dict(versions or {})
+
+    def __getitem__(self, name):
+        value = self._data[name]
+        if isinstance(value, pd.DataFrame):
+            value = value.copy(deep=False)
+            value.index = value.index.copy()
+            value.columns = value.columns.copy()
+        return value
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def freeze(data_dict, versions=None):
+    """
+    Wraps datasets in a read-only mapping, so one copy can serve every chart, rerun and session
+    :param data_dict: dict with metric names as keys and DataFrames as values
+    :param versions: optional dict with metric names as keys and identifiers of their data as values
+    :return: FrozenData
     """
-    tasks = [metric.fetch_data() for metric in metrics]
-    results = await asyncio.gather(*tasks)
-    data = {key: value for result in results for key, value in result.items()}
-    return data
+    return FrozenData(data_dict, versions)
 
 
 def merge_dataframes(data_dict, metric_names):